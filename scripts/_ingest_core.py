@@ -0,0 +1,120 @@
+"""
+Supabase I/O shared by the ingest scripts.
+
+Each script maps its export into (order_payload, item_rows) pairs and hands
+them to ingest(), which batches the orders upsert and the order_items rewrite.
+"""
+import atexit, hashlib, json, os
+import httpx
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from supabase import create_client
+from normalize import normalize_item_rows
+
+try:
+    import orjson
+
+    def load_json(path):
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+except ImportError:  # orjson is optional; stdlib parses the same structures
+    def load_json(path):
+        with open(path, "r") as f:
+            return json.load(f)
+
+# Orders per request. Kept modest because the order_items cleanup passes every
+# order id of a batch in one `in.(...)` filter, which lives in the URL.
+BATCH_SIZE = 100
+# Concurrent batch writers; must stay <= the HTTP connection pool size.
+MAX_WORKERS = 8
+POOL_SIZE = 20
+
+def create_supabase():
+    sb = create_client(
+        os.environ["SUPABASE_URL"],
+        os.environ["SUPABASE_SERVICE_ROLE_KEY"],
+    )
+
+    # Swap in a pooled HTTP/2 client (needs httpx[http2]) so every PostgREST call
+    # reuses the same connection; base_url and auth headers carry over.
+    default_session = sb.postgrest.session
+    sb.postgrest.session = httpx.Client(
+        base_url=default_session.base_url,
+        headers=default_session.headers,
+        http2=True,
+        limits=httpx.Limits(max_keepalive_connections=POOL_SIZE, max_connections=POOL_SIZE),
+        timeout=30.0,
+    )
+    default_session.close()
+    atexit.register(sb.postgrest.session.close)
+    return sb
+
+def upsert_locations(sb, names) -> dict:
+    res = sb.table("locations").upsert(
+        [{"name": n} for n in names], on_conflict="name", returning="representation"
+    ).execute()
+    return {r["name"]: r["id"] for r in res.data}
+
+def file_hash(*paths) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+    return h.hexdigest()
+
+def already_ingested(sb, source: str, h: str) -> bool:
+    """True when `h` matches the last ingested hash, unless INGEST_FORCE=1."""
+    if os.environ.get("INGEST_FORCE") == "1":
+        return False
+    rows = sb.table("ingest_state").select("hash").eq("source", source).execute().data
+    return bool(rows) and rows[0]["hash"] == h
+
+def mark_ingested(sb, source: str, h: str):
+    sb.table("ingest_state").upsert(
+        {"source": source, "hash": h, "ingested_at": datetime.now(timezone.utc).isoformat()},
+        on_conflict="source", returning="minimal",
+    ).execute()
+
+def chunked(rows, size=BATCH_SIZE):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+def _write_batch(sb, batch, items_by_key):
+    res = sb.table("orders").upsert(
+        batch, on_conflict="source,source_order_id", returning="representation"
+    ).execute()
+    order_ids = {(r["source"], r["source_order_id"]): r["id"] for r in res.data}
+
+    # prevent duplicates on rerun; one in.() delete per batch, nothing echoed back
+    sb.table("order_items").delete(returning="minimal") \
+        .in_("order_id", list(order_ids.values())).execute()
+
+    item_rows = [
+        {**r, "order_id": order_id}
+        for key, order_id in order_ids.items()
+        for r in items_by_key.get(key, [])
+    ]
+    for item_batch in chunked(item_rows, 500):
+        sb.table("order_items").insert(item_batch, returning="minimal").execute()
+
+def ingest(source, orders_iter, sb, batch_size=BATCH_SIZE):
+    """
+    Writes (order_payload, item_rows) pairs for one source.
+    Item rows come without order_id and normalized_* fields; both are filled here.
+    A repeated source_order_id keeps its last version. Batches share no orders,
+    so they are written concurrently.
+    """
+    # keyed by (source, source_order_id)
+    order_payloads = {}
+    items_by_key = {}
+    for order_payload, item_rows in orders_iter:
+        key = (source, order_payload["source_order_id"])
+        order_payloads[key] = order_payload
+        items_by_key[key] = item_rows
+
+    normalize_item_rows([r for rows in items_by_key.values() for r in rows])
+
+    batches = chunked(list(order_payloads.values()), batch_size)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as ex:
+        list(ex.map(lambda b: _write_batch(sb, b, items_by_key), batches))
@@ -1,14 +1,12 @@
-import json, os
 from dotenv import load_dotenv
-from supabase import create_client
-from normalize import normalize_name, normalize_category
+from _ingest_core import (
+    already_ingested, create_supabase, file_hash, ingest, load_json, mark_ingested,
+    upsert_locations,
+)
 
 load_dotenv()
 
-sb = create_client(
-    os.environ["SUPABASE_URL"],
-    os.environ["SUPABASE_SERVICE_ROLE_KEY"],
-)
+sb = create_supabase()
 
 DD_LOC_TO_CANON = {
     "str_downtown_001": "Downtown",
@@ -17,29 +15,22 @@ DD_LOC_TO_CANON = {
     "str_university_004": "University",
 }
 
-def upsert_location(name: str) -> str:
-    sb.table("locations").upsert({"name": name}, on_conflict="name").execute()
-    return sb.table("locations").select("id").eq("name", name).single().execute().data["id"]
-
 def to_int_cents(x):
     # DoorDash fields might already be ints; handle None safely
+    if type(x) is int:
+        return x
     try:
         return int(x or 0)
     except Exception:
         return 0
 
-def main():
-    path = "data/sources/doordash_orders.json"
-    with open(path, "r") as f:
-        dd = json.load(f)
-
-    loc_id = {name: upsert_location(name) for name in set(DD_LOC_TO_CANON.values())}
-
-    # Depending on file shape, orders may live at top-level "orders"
-    orders = dd.get("orders", [])
+def iter_orders(orders, loc_id):
+    """Maps DoorDash orders to (order_payload, item_rows) pairs for ingest()."""
+    # bound once: looked up for every order below
+    loc_get = DD_LOC_TO_CANON.get
     for o in orders:
         store_id = o.get("store_id")
-        canon_loc = DD_LOC_TO_CANON.get(store_id)
+        canon_loc = loc_get(store_id)
         if not canon_loc:
             continue
 
@@ -80,15 +71,6 @@ def main():
             "total_cents": total,
         }
 
-        sb.table("orders").upsert(order_payload, on_conflict="source,source_order_id").execute()
-
-        order_id = sb.table("orders").select("id") \
-            .eq("source","DOORDASH").eq("source_order_id", str(source_order_id)) \
-            .single().execute().data["id"]
-
-        # prevent duplicates on rerun
-        sb.table("order_items").delete().eq("order_id", order_id).execute()
-
         item_rows = []
         for it in o.get("order_items", []):
             raw_name = it.get("name") or "unknown"
@@ -102,19 +84,30 @@ def main():
                 line_total = int(unit_price * qty)
 
             item_rows.append({
-                "order_id": order_id,
                 "raw_name": raw_name,
-                "normalized_name": normalize_name(raw_name),
                 "raw_category": raw_cat,
-                "normalized_category": normalize_category(raw_cat),
                 "quantity": qty,
                 "unit_price_cents": unit_price or None,
                 "line_total_cents": line_total,
             })
+        yield order_payload, item_rows
+
+def main():
+    path = "data/sources/doordash_orders.json"
+    h = file_hash(path)
+    if already_ingested(sb, "DOORDASH", h):
+        print("DoorDash export unchanged since last ingestion, skipping")
+        return
 
-        if item_rows:
-            sb.table("order_items").insert(item_rows).execute()
+    dd = load_json(path)
+
+    loc_id = upsert_locations(sb, set(DD_LOC_TO_CANON.values()))
+
+    # Depending on file shape, orders may live at top-level "orders"
+    orders = dd.get("orders", [])
+    ingest("DOORDASH", iter_orders(orders, loc_id), sb)
 
+    mark_ingested(sb, "DOORDASH", h)
     print("DoorDash ingestion done")
 
 if __name__ == "__main__":
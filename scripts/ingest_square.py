@@ -1,15 +1,20 @@
-import json, os
+import json
 from dotenv import load_dotenv
 from typing import Optional
-from supabase import create_client
-from normalize import normalize_name, normalize_category
+from _ingest_core import (
+    already_ingested, create_supabase, file_hash, ingest, load_json, mark_ingested,
+    upsert_locations,
+)
 
 load_dotenv()
 
-sb = create_client(
-    os.environ["SUPABASE_URL"],
-    os.environ["SUPABASE_SERVICE_ROLE_KEY"],
-)
+try:
+    # ijson picks its fastest available backend (yajl2_c when compiled)
+    import ijson
+except ImportError:  # without it the catalog is parsed in one go
+    ijson = None
+
+sb = create_supabase()
 
 SQUARE_LOC_TO_CANON = {
     "LCN001DOWNTOWN": "Downtown",
@@ -18,76 +23,69 @@ SQUARE_LOC_TO_CANON = {
     "LCN004UNIV": "University",
 }
 
-def upsert_location(name: str) -> str:
-    sb.table("locations").upsert({"name": name}, on_conflict="name").execute()
-    return sb.table("locations").select("id").eq("name", name).single().execute().data["id"]
-
 def to_int_cents(money_obj):
     # Square money is { "amount": 123, "currency": "USD" }
     if not money_obj:
         return 0
-    return int(money_obj.get("amount") or 0)
+    amount = money_obj.get("amount")
+    if type(amount) is int:
+        return amount
+    return int(amount or 0)
 
 def pick_ordered_at(o: dict) -> Optional[str]:
     return o.get("closed_at") or o.get("created_at")
 
-def build_catalog_maps(catalog):
+def iter_catalog_objects(path):
+    """Yields catalog objects one at a time, streaming with ijson when installed."""
+    with open(path, "rb") as f:
+        if ijson is not None:
+            yield from ijson.items(f, "objects.item", use_float=True)
+        else:
+            yield from json.load(f).get("objects", [])
+
+def build_catalog_maps(objects):
     """
+    Takes an iterable of catalog objects, in any order.
     Returns:
-      variation_id -> {name, item_name, category_name}
+      variation_id -> {item_name, variation_name, category_name}
     """
     # category_id -> category_name
     category_names = {}
-    # item_id -> {item_name, category_id}
-    items = {}
-    # variation_id -> {variation_name, item_id}
-    variations = {}
+    get_category = category_names.get
+    variation_map = {}
+    # (entry, category_id) for variations seen before their category
+    deferred = []
 
-    for obj in catalog.get("objects", []):
+    for obj in objects:
         t = obj.get("type")
         if t == "CATEGORY":
             category_names[obj["id"]] = (obj.get("category_data") or {}).get("name")
         elif t == "ITEM":
             data = obj.get("item_data") or {}
-            items[obj["id"]] = {
-                "name": data.get("name"),
-                "category_id": data.get("category_id"),
-            }
+            item_name = data.get("name")
+            category_id = data.get("category_id")
+            category_known = category_id is None or category_id in category_names
             for v in data.get("variations", []):
-                variations[v["id"]] = {
+                entry = variation_map[v["id"]] = {
+                    "item_name": item_name,
                     "variation_name": (v.get("item_variation_data") or {}).get("name"),
-                    "item_id": obj["id"],
+                    "category_name": get_category(category_id),
                 }
+                if not category_known:
+                    deferred.append((entry, category_id))
 
-    variation_map = {}
-    for var_id, v in variations.items():
-        item = items.get(v["item_id"], {})
-        cat_name = category_names.get(item.get("category_id"))
-        variation_map[var_id] = {
-            "item_name": item.get("name"),
-            "variation_name": v.get("variation_name"),
-            "category_name": cat_name,
-        }
+    for entry, category_id in deferred:
+        entry["category_name"] = get_category(category_id)
 
     return variation_map
 
-def main():
-    catalog_path = "data/sources/square/catalog.json"
-    orders_path = "data/sources/square/orders.json"
-
-    with open(catalog_path, "r") as f:
-        catalog = json.load(f)
-    with open(orders_path, "r") as f:
-        orders_blob = json.load(f)
-
-    variation_map = build_catalog_maps(catalog)
-
-    loc_id = {name: upsert_location(name) for name in set(SQUARE_LOC_TO_CANON.values())}
-
-    orders = orders_blob.get("orders", [])
+def iter_orders(orders, loc_id, variation_map):
+    """Maps Square orders to (order_payload, item_rows) pairs for ingest()."""
+    # bound once: looked up for every order below
+    loc_get = SQUARE_LOC_TO_CANON.get
     for o in orders:
         sq_loc = o.get("location_id")
-        canon_loc = SQUARE_LOC_TO_CANON.get(sq_loc)
+        canon_loc = loc_get(sq_loc)
         if not canon_loc:
             continue
 
@@ -125,14 +123,6 @@ def main():
             "total_cents": total,
         }
 
-        sb.table("orders").upsert(order_payload, on_conflict="source,source_order_id").execute()
-
-        order_id = sb.table("orders").select("id") \
-            .eq("source","SQUARE").eq("source_order_id", str(source_order_id)) \
-            .single().execute().data["id"]
-
-        sb.table("order_items").delete().eq("order_id", order_id).execute()
-
         item_rows = []
         for li in o.get("line_items", []):
             qty = float(li.get("quantity") or 1)
@@ -158,19 +148,34 @@ def main():
                 unit_price = int(line_total / qty)
 
             item_rows.append({
-                "order_id": order_id,
                 "raw_name": raw_name,
-                "normalized_name": normalize_name(raw_name),
                 "raw_category": raw_cat,
-                "normalized_category": normalize_category(raw_cat),
                 "quantity": qty,
                 "unit_price_cents": unit_price,
                 "line_total_cents": line_total,
             })
 
-        if item_rows:
-            sb.table("order_items").insert(item_rows).execute()
+        yield order_payload, item_rows
+
+def main():
+    catalog_path = "data/sources/square/catalog.json"
+    orders_path = "data/sources/square/orders.json"
+
+    h = file_hash(catalog_path, orders_path)
+    if already_ingested(sb, "SQUARE", h):
+        print("Square export unchanged since last ingestion, skipping")
+        return
+
+    orders_blob = load_json(orders_path)
+
+    variation_map = build_catalog_maps(iter_catalog_objects(catalog_path))
+
+    loc_id = upsert_locations(sb, set(SQUARE_LOC_TO_CANON.values()))
+
+    orders = orders_blob.get("orders", [])
+    ingest("SQUARE", iter_orders(orders, loc_id, variation_map), sb)
 
+    mark_ingested(sb, "SQUARE", h)
     print("Square ingestion done")
 
 if __name__ == "__main__":
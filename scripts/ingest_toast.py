@@ -1,15 +1,13 @@
-import json, os
 from dotenv import load_dotenv
 from typing import Optional
-from supabase import create_client
-from normalize import normalize_name, normalize_category
+from _ingest_core import (
+    already_ingested, create_supabase, file_hash, ingest, load_json, mark_ingested,
+    upsert_locations,
+)
 
 load_dotenv()
 
-sb = create_client(
-    os.environ["SUPABASE_URL"],
-    os.environ["SUPABASE_SERVICE_ROLE_KEY"],
-)
+sb = create_supabase()
 
 TOAST_LOC_TO_CANON = {
     "loc_downtown_001": "Downtown",
@@ -21,20 +19,12 @@ TOAST_LOC_TO_CANON = {
 def pick_ordered_at(o: dict) -> Optional[str]:
     return o.get("paidDate") or o.get("closedDate") or o.get("openedDate")
 
-def upsert_location(name: str) -> str:
-    sb.table("locations").upsert({"name": name}, on_conflict="name").execute()
-    return sb.table("locations").select("id").eq("name", name).single().execute().data["id"]
-
-def main():
-    # adjust this path if your repo differs
-    path = "data/sources/toast_pos_export.json"
-    with open(path, "r") as f:
-        toast = json.load(f)
-
-    loc_id = {name: upsert_location(name) for name in set(TOAST_LOC_TO_CANON.values())}
-
-    for o in toast.get("orders", []):
-        canon_loc = TOAST_LOC_TO_CANON.get(o.get("restaurantGuid"))
+def iter_orders(orders, loc_id):
+    """Maps Toast orders to (order_payload, item_rows) pairs for ingest()."""
+    # bound once: looked up for every order below
+    loc_get = TOAST_LOC_TO_CANON.get
+    for o in orders:
+        canon_loc = loc_get(o.get("restaurantGuid"))
         if not canon_loc:
             continue
 
@@ -62,9 +52,7 @@ def main():
 
                 item_rows.append({
                     "raw_name": raw_name,
-                    "normalized_name": normalize_name(raw_name),
                     "raw_category": raw_cat,
-                    "normalized_category": normalize_category(raw_cat),
                     "quantity": qty,
                     "unit_price_cents": None,
                     "line_total_cents": line_total,
@@ -84,22 +72,23 @@ def main():
             "total_cents": total if total else (item_sales + tax + tip),
         }
 
-        # Upsert order
-        sb.table("orders").upsert(order_payload, on_conflict="source,source_order_id").execute()
+        yield order_payload, item_rows
+
+def main():
+    # adjust this path if your repo differs
+    path = "data/sources/toast_pos_export.json"
+    h = file_hash(path)
+    if already_ingested(sb, "TOAST", h):
+        print("Toast export unchanged since last ingestion, skipping")
+        return
 
-        # Fetch order id
-        order_id = sb.table("orders").select("id") \
-            .eq("source","TOAST").eq("source_order_id", o["guid"]).single().execute().data["id"]
+    toast = load_json(path)
 
-        # Prevent duplicates if you rerun script
-        sb.table("order_items").delete().eq("order_id", order_id).execute()
+    loc_id = upsert_locations(sb, set(TOAST_LOC_TO_CANON.values()))
 
-        # Insert items
-        if item_rows:
-            for r in item_rows:
-                r["order_id"] = order_id
-            sb.table("order_items").insert(item_rows).execute()
+    ingest("TOAST", iter_orders(toast.get("orders", []), loc_id), sb)
 
+    mark_ingested(sb, "TOAST", h)
     print("Toast ingestion done")
 
 if __name__ == "__main__":
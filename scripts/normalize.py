@@ -1,24 +1,53 @@
-import re
 import unicodedata
+from functools import lru_cache
 
-# Catches emojis outside the BMP (kept as a fallback)
-_EMOJI_RE = re.compile(r"[\U00010000-\U0010ffff]", flags=re.UNICODE)
+class _StripTable(dict):
+    """
+    str.translate table that drops unicode symbols (this includes many emojis
+    like ☕) and anything outside the BMP. Filled lazily: each code point is
+    classified once, after that the lookup stays in C.
+    """
+    def __missing__(self, cp):
+        keep = cp < 0x10000 and unicodedata.category(chr(cp))[0] != "S"
+        self[cp] = cp if keep else None
+        return self[cp]
+
+_STRIP_TABLE = _StripTable()
+
+try:
+    import regex
+
+    # \p{S} covers BMP symbols like ☕, the range covers high-codepoint emojis
+    _SYMBOL_RE = regex.compile(r"[\p{S}\U00010000-\U0010ffff]+")
 
+    def _strip_symbols(s: str) -> str:
+        return _SYMBOL_RE.sub("", s)
+except ImportError:  # regex is optional; the translate table strips the same classes
+    def _strip_symbols(s: str) -> str:
+        return s.translate(_STRIP_TABLE)
+
+# Menus are small, so the same few names/categories repeat across every order.
+@lru_cache(maxsize=8192)
 def normalize_name(s: str) -> str:
     """Lowercase + trim + collapse whitespace."""
     return " ".join((s or "").strip().lower().split())
 
+@lru_cache(maxsize=8192)
 def normalize_category(s: str) -> str:
     """
     Lowercase + trim + collapse whitespace, and remove emoji/symbol-like chars.
-    This handles cases like '☕ coffee' where the emoji isn't matched by _EMOJI_RE.
+    A single pass covers both '☕ coffee' (BMP symbol) and high-codepoint emojis.
     """
-    s = (s or "").strip()
-
-    # Remove all unicode symbols (this includes many emojis like ☕)
-    s = "".join(ch for ch in s if unicodedata.category(ch)[0] != "S")
-
-    # Fallback: remove high-codepoint emojis too
-    s = _EMOJI_RE.sub("", s)
+    return " ".join(_strip_symbols(s or "").lower().split())
 
-    return " ".join(s.lower().split())
+def normalize_item_rows(rows):
+    """
+    Fills normalized_name / normalized_category on order_items rows a column at
+    a time: each distinct raw value is normalized once, then mapped back.
+    """
+    names = {n: normalize_name(n) for n in {r["raw_name"] for r in rows}}
+    cats = {c: normalize_category(c) for c in {r["raw_category"] for r in rows}}
+    for r in rows:
+        r["normalized_name"] = names[r["raw_name"]]
+        r["normalized_category"] = cats[r["raw_category"]]
+    return rows
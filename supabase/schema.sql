@@ -39,3 +39,10 @@ create table if not exists order_items (
 create index if not exists idx_order_items_order on order_items (order_id);
 create index if not exists idx_order_items_norm_name on order_items (normalized_name);
 
+
+-- last ingested content hash per source, lets ingest scripts skip unchanged exports
+create table if not exists ingest_state (
+  source text primary key,
+  hash text not null,
+  ingested_at timestamptz not null default now()
+);